@@ -6,40 +6,29 @@ Run with `uv run scripts/download_syzygy.py`
 """
 from __future__ import annotations
 
+import re
+import shutil
 import sys
 import time
 import urllib.parse
 import urllib.request
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from html.parser import HTMLParser
 from pathlib import Path
-from typing import Iterable, Sequence
+from typing import Iterable
 
 # Configuration
 BASE_URL = "https://tablebase.lichess.ovh/tables/standard/3-4-5-wdl/"
 DEST_DIR = Path(__file__).resolve().parents[1] / "data" / "syzygy"
 CHUNK_SIZE = 1 << 20  # 1 MiB chunks
+MAX_WORKERS = 8  # concurrent downloads
 OVERWRITE = True
 DRY_RUN = False
 USER_AGENT = "heisenbase-syzygy-downloader/1.0 (+https://lichess.org)"
 PIECE_LETTERS = frozenset("KPNBRQ")
-
-
-class _IndexParser(HTMLParser):
-    """Collect all href values that point at *.rtbw files."""
-
-    def __init__(self) -> None:
-        super().__init__()
-        self.links: list[str] = []
-
-    def handle_starttag(self, tag: str, attrs: Sequence[tuple[str, str]]) -> None:
-        if tag != "a":
-            return
-        for key, value in attrs:
-            if key == "href" and value.endswith(".rtbw"):
-                self.links.append(value)
-                break
+# Directory listing links that point at *.rtbw files.
+_LINK_RE = re.compile(rb'href="([^"]+\.rtbw)"')
 
 
 @dataclass(frozen=True)
@@ -59,16 +48,15 @@ def fetch_table_index() -> Iterable[str]:
     )
     with urllib.request.urlopen(request) as response:
         charset = response.headers.get_content_charset("utf-8")
-        html = response.read().decode(charset, errors="replace")
-    parser = _IndexParser()
-    parser.feed(html)
-    return parser.links
+        body = response.read()
+    return [link.decode(charset, errors="replace") for link in _LINK_RE.findall(body)]
 
 
 def classify_tables(names: Iterable[str]) -> list[TableEntry]:
     entries: list[TableEntry] = []
     for name in names:
-        piece_count = sum(1 for char in Path(name).stem if char in PIECE_LETTERS)
+        stem = Path(name).stem
+        piece_count = sum(stem.count(letter) for letter in PIECE_LETTERS)
         if piece_count in {3, 4}:
             entries.append(TableEntry(name=name, piece_count=piece_count))
     entries.sort(key=lambda entry: (entry.piece_count, entry.name))
@@ -103,16 +91,11 @@ def download_table(
 
     request = urllib.request.Request(entry.url, headers={"User-Agent": USER_AGENT})
     start = time.monotonic()
-    bytes_written = 0
     with urllib.request.urlopen(request) as response:
         with open(tmp_path, "wb") as fh:
-            while True:
-                chunk = response.read(chunk_size)
-                if not chunk:
-                    break
-                fh.write(chunk)
-                bytes_written += len(chunk)
+            shutil.copyfileobj(response, fh, length=chunk_size)
 
+    bytes_written = tmp_path.stat().st_size
     tmp_path.replace(dest_path)
     elapsed = time.monotonic() - start
     rate = bytes_written / elapsed if elapsed > 0 else 0
@@ -145,19 +128,29 @@ def main() -> int:
         return 0
 
     total = len(tables)
-    for index, entry in enumerate(tables, start=1):
-        print(
-            f"[{index}/{total}] {entry.piece_count}-man {entry.name} ... ",
-            end="",
-            flush=True,
-        )
-        _, message = download_table(
-            entry=entry,
-            dest_dir=dest_dir,
-            chunk_size=CHUNK_SIZE,
-            overwrite=OVERWRITE,
-        )
-        print(message)
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        futures = {
+            pool.submit(
+                download_table,
+                entry=entry,
+                dest_dir=dest_dir,
+                chunk_size=CHUNK_SIZE,
+                overwrite=OVERWRITE,
+            ): entry
+            for entry in tables
+        }
+        try:
+            for index, future in enumerate(as_completed(futures), start=1):
+                entry = futures[future]
+                _, message = future.result()
+                print(
+                    f"[{index}/{total}] {entry.piece_count}-man {entry.name} ... {message}",
+                    flush=True,
+                )
+        except BaseException:
+            # Stop on the first failure or Ctrl-C instead of draining the queue.
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
 
     print("\nAll requested tables are present.")
     return 0
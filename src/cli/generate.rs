@@ -1,5 +1,5 @@
 use anyhow::Result;
-use heisenbase::generation_targets::compute_generation_targets;
+use heisenbase::generation_targets::{PgnIndexSnapshot, compute_generation_targets_with_index};
 use heisenbase::material_key::MaterialKey;
 use heisenbase::storage::{self, Database, MaterialStatsRow};
 use heisenbase::table_builder::TableBuilder;
@@ -109,9 +109,10 @@ fn log_stats_to_index(db: &Database, wdl_table: &WdlTable, counts: &[usize; 7])
 
 pub(crate) fn run_generate_many(min_games: u64, max_pieces: u32) -> Result<()> {
     let db = Database::open_default()?;
+    let pgn_index = PgnIndexSnapshot::load(&db, min_games, max_pieces)?;
 
     loop {
-        let Some(target) = compute_generation_targets(&db, min_games, max_pieces)?
+        let Some(target) = compute_generation_targets_with_index(&db, &pgn_index, 1)?
             .into_iter()
             .next()
         else {
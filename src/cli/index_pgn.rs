@@ -31,8 +31,7 @@ pub fn run_stage1() -> Result<()> {
     collect_pgn_files(Path::new(PGN_ROOT), &mut files)?;
     files.sort();
 
-    let mut counts_games: HashMap<MaterialKey, u64> = HashMap::new();
-    let mut counts_positions: HashMap<MaterialKey, u64> = HashMap::new();
+    let mut counts: HashMap<MaterialKey, MaterialCounts> = HashMap::new();
     let mut total_games: u64 = 0;
     let mut total_positions: u64 = 0;
 
@@ -42,33 +41,25 @@ pub fn run_stage1() -> Result<()> {
         let game_count = if is_gz(&path) {
             process_reader(
                 MultiGzDecoder::new(file),
-                &mut counts_games,
-                &mut counts_positions,
+                &mut counts,
                 &mut total_positions,
                 &path,
             )?
         } else {
-            process_reader(
-                file,
-                &mut counts_games,
-                &mut counts_positions,
-                &mut total_positions,
-                &path,
-            )?
+            process_reader(file, &mut counts, &mut total_positions, &path)?
         };
         total_games += game_count;
     }
 
     println!("Processed {total_games} games.");
 
-    let mut entries: Vec<_> = counts_games.into_iter().collect();
-    entries.sort_by(|a, b| b.1.cmp(&a.1).then_with(|| a.0.cmp(&b.0)));
+    let entries = ranked_entries(counts);
 
     println!(
         "Collected {} unique material keys. Writing raw index to SQLite...",
         entries.len()
     );
-    write_raw_index(&entries, &counts_positions, total_games, total_positions)?;
+    write_raw_index(&entries, total_games, total_positions)?;
     Ok(())
 }
 
@@ -132,15 +123,13 @@ pub fn run_stage2() -> Result<()> {
 
 fn process_reader<R: Read>(
     reader: R,
-    counts_games: &mut HashMap<MaterialKey, u64>,
-    counts_positions: &mut HashMap<MaterialKey, u64>,
+    counts: &mut HashMap<MaterialKey, MaterialCounts>,
     total_positions: &mut u64,
     path: &Path,
 ) -> Result<u64> {
     let mut reader = Reader::new(reader);
     let mut visitor = IndexVisitor {
-        counts_games,
-        counts_positions,
+        counts,
         total_positions,
         games: 0,
     };
@@ -170,9 +159,19 @@ fn process_reader<R: Read>(
     Ok(visitor.games)
 }
 
+/// Keeps only keys seen in at least one completed game, most frequent first.
+/// Games skipped partway through still count positions, but never reach `end_game`.
+fn ranked_entries(
+    mut counts: HashMap<MaterialKey, MaterialCounts>,
+) -> Vec<(MaterialKey, MaterialCounts)> {
+    counts.retain(|_, c| c.games > 0);
+    let mut entries: Vec<_> = counts.into_iter().collect();
+    entries.sort_by(|a, b| b.1.games.cmp(&a.1.games).then_with(|| a.0.cmp(&b.0)));
+    entries
+}
+
 fn write_raw_index(
-    entries: &[(MaterialKey, u64)],
-    counts_positions: &HashMap<MaterialKey, u64>,
+    entries: &[(MaterialKey, MaterialCounts)],
     total_games: u64,
     total_positions: u64,
 ) -> Result<()> {
@@ -181,11 +180,11 @@ fn write_raw_index(
     let mut rows = Vec::with_capacity(entries.len());
 
     println!("Inserting {} raw-index rows...", entries.len());
-    for (idx, (key, count_games)) in entries.iter().enumerate() {
+    for (idx, (key, counts)) in entries.iter().enumerate() {
         rows.push(PgnIndexRawRow {
             material_key: key.to_string(),
-            num_games: *count_games as i64,
-            num_positions: *counts_positions.get(key).unwrap_or(&0) as i64,
+            num_games: counts.games as i64,
+            num_positions: counts.positions as i64,
             total_games: total_games as i64,
             total_positions: total_positions as i64,
         });
@@ -206,9 +205,14 @@ fn parse_material_key(key: &str) -> Result<MaterialKey> {
     MaterialKey::from_string(key).map_err(|err| anyhow!("invalid material_key: {key}: {err}"))
 }
 
+#[derive(Default)]
+struct MaterialCounts {
+    games: u64,
+    positions: u64,
+}
+
 struct IndexVisitor<'a> {
-    counts_games: &'a mut HashMap<MaterialKey, u64>,
-    counts_positions: &'a mut HashMap<MaterialKey, u64>,
+    counts: &'a mut HashMap<MaterialKey, MaterialCounts>,
     total_positions: &'a mut u64,
     games: u64,
 }
@@ -266,7 +270,7 @@ impl<'a> Visitor for IndexVisitor<'a> {
             *self.total_positions += 1;
             if key.non_pawn_piece_count() <= MAX_NON_PAWN {
                 seen.insert(key.clone());
-                *self.counts_positions.entry(key).or_insert(0) += 1;
+                self.counts.entry(key).or_default().positions += 1;
             }
         }
         ControlFlow::Continue(GameState { position, seen })
@@ -299,7 +303,7 @@ impl<'a> Visitor for IndexVisitor<'a> {
             *self.total_positions += 1;
             if key.non_pawn_piece_count() <= MAX_NON_PAWN {
                 movetext.seen.insert(key.clone());
-                *self.counts_positions.entry(key).or_insert(0) += 1;
+                self.counts.entry(key).or_default().positions += 1;
             }
         }
         ControlFlow::Continue(())
@@ -308,7 +312,7 @@ impl<'a> Visitor for IndexVisitor<'a> {
     fn end_game(&mut self, movetext: Self::Movetext) -> Self::Output {
         self.games += 1;
         for key in movetext.seen {
-            *self.counts_games.entry(key).or_insert(0) += 1;
+            self.counts.entry(key).or_default().games += 1;
         }
         Ok(())
     }
@@ -419,3 +423,40 @@ fn extract_io_error(err: &anyhow::Error) -> Option<&io::Error> {
     err.chain()
         .find_map(|cause| cause.downcast_ref::<io::Error>())
 }
+
+#[cfg(test)]
+mod tests {
+    use super::{MaterialKey, process_reader, ranked_entries};
+    use std::collections::HashMap;
+    use std::path::Path;
+
+    #[test]
+    fn drops_keys_seen_only_in_games_skipped_partway() {
+        let pgn = b"[FEN \"4k3/8/8/8/8/8/8/4K2R w - - 0 1\"]\n\n1. Rh2 Kd7 2. Qd1 *\n\n\
+[FEN \"4k3/8/8/8/8/8/8/3QK3 w - - 0 1\"]\n\n1. Qd2 Ke7 *\n";
+        let mut counts = HashMap::new();
+        let mut total_positions = 0;
+
+        let games = process_reader(
+            &pgn[..],
+            &mut counts,
+            &mut total_positions,
+            Path::new("test"),
+        )
+        .expect("process pgn");
+
+        assert_eq!(games, 1);
+        assert_eq!(total_positions, 6);
+
+        let krvk = MaterialKey::from_string("KRvK").expect("parse KRvK");
+        let kqvk = MaterialKey::from_string("KQvK").expect("parse KQvK");
+        assert_eq!(counts[&krvk].games, 0);
+        assert_eq!(counts[&krvk].positions, 3);
+
+        let entries = ranked_entries(counts);
+        assert_eq!(entries.len(), 1);
+        assert_eq!(entries[0].0, kqvk);
+        assert_eq!(entries[0].1.games, 1);
+        assert_eq!(entries[0].1.positions, 3);
+    }
+}
@@ -22,7 +22,7 @@ pub(crate) struct FrontierArgs {
 
 pub(crate) fn run(args: FrontierArgs) -> Result<()> {
     let db = Database::open_default()?;
-    let targets = compute_generation_targets(&db, args.min_games, args.max_pieces)?;
+    let targets = compute_generation_targets(&db, args.min_games, args.max_pieces, args.limit)?;
 
     println!("limit: {}", args.limit);
     println!("min_games: {}", args.min_games);
@@ -31,7 +31,7 @@ pub(crate) fn run(args: FrontierArgs) -> Result<()> {
         "material_key\taction\tis_stale\tnum_games\tmaterial_key_size\tutility\tutility_rank\ttransitive_utility\ttransitive_utility_rank"
     );
 
-    for target in targets.into_iter().take(args.limit) {
+    for target in targets {
         println!(
             "{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}\t{}",
             target.material_key,
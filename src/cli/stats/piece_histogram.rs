@@ -1,7 +1,7 @@
 use anyhow::{Context, Result};
 use clap::Args;
 use heisenbase::storage::Database;
-use polars::prelude::*;
+use rusqlite::params;
 
 #[derive(Args)]
 #[command(
@@ -70,93 +70,45 @@ fn build_piece_histogram(
     min_games: u64,
     max_pieces: Option<u32>,
 ) -> Result<Vec<HistogramRow>> {
-    let mut ranked = load_pgn_index_df(db)?.lazy().filter(
-        col("num_games")
-            .cast(DataType::Int64)
-            .gt_eq(lit(min_games as i64)),
-    );
-    if let Some(max_pieces) = max_pieces {
-        ranked = ranked.filter(
-            col("num_pieces")
-                .cast(DataType::Int64)
-                .lt_eq(lit(max_pieces as i64)),
-        );
-    }
-
-    let grouped = ranked
-        .with_columns([
-            (col("utility") / col("material_key_size").cast(DataType::Float64))
-                .alias("utility_rank"),
-        ])
-        .sort(
-            ["utility_rank", "utility", "material_key"],
-            SortMultipleOptions::new().with_order_descending_multi([true, true, false]),
-        )
-        .with_columns([col("material_key_size")
-            .cum_sum(false)
-            .alias("cumulative_positions")])
-        .filter(col("cumulative_positions").lt_eq(lit(max_positions)))
-        .group_by([col("num_pieces")])
-        .agg([
-            col("material_key").count().alias("tables"),
-            col("material_key_size").sum().alias("positions"),
-            col("utility").sum().alias("pgn_position_fraction"),
-        ])
-        .sort(["num_pieces"], SortMultipleOptions::default())
-        .collect()?;
-
-    let num_pieces = grouped.column("num_pieces")?.i64()?;
-    let tables = grouped.column("tables")?.u32()?;
-    let positions = grouped.column("positions")?.i64()?;
-    let pgn_position_fraction = grouped.column("pgn_position_fraction")?.f64()?;
-    let mut rows = Vec::with_capacity(grouped.height());
-    for index in 0..grouped.height() {
-        rows.push(HistogramRow {
-            num_pieces: num_pieces.get(index).unwrap(),
-            tables: i64::from(tables.get(index).unwrap()),
-            positions: positions.get(index).unwrap(),
-            pgn_position_fraction: pgn_position_fraction.get(index).unwrap(),
-        });
-    }
-    Ok(rows)
-}
-
-fn load_pgn_index_df(db: &Database) -> Result<DataFrame> {
+    // Ranking, the running size total, and the per-piece-count aggregation all
+    // run inside SQLite so only one row per piece count leaves the database.
     let mut stmt = db.conn().prepare(
-        "SELECT material_key, num_games, num_pieces, material_key_size, utility
-         FROM pgn_index",
+        "WITH ranked AS (
+            SELECT
+                num_pieces,
+                material_key_size,
+                utility,
+                SUM(material_key_size) OVER (
+                    ORDER BY utility_rank DESC, utility DESC, material_key ASC
+                    ROWS UNBOUNDED PRECEDING
+                ) AS cumulative_positions
+            FROM pgn_index_ranked
+            WHERE num_games >= ?1
+              AND (?2 IS NULL OR num_pieces <= ?2)
+         )
+         SELECT
+            num_pieces,
+            COUNT(*),
+            SUM(material_key_size),
+            SUM(utility)
+         FROM ranked
+         WHERE cumulative_positions <= ?3
+         GROUP BY num_pieces
+         ORDER BY num_pieces",
+    )?;
+    let rows = stmt.query_map(
+        params![min_games as i64, max_pieces.map(i64::from), max_positions],
+        |row| {
+            Ok(HistogramRow {
+                num_pieces: row.get(0)?,
+                tables: row.get(1)?,
+                positions: row.get(2)?,
+                pgn_position_fraction: row.get(3)?,
+            })
+        },
     )?;
-    let rows = stmt.query_map([], |row| {
-        Ok((
-            row.get::<_, String>(0)?,
-            row.get::<_, i64>(1)?,
-            row.get::<_, i64>(2)?,
-            row.get::<_, i64>(3)?,
-            row.get::<_, f64>(4)?,
-        ))
-    })?;
-
-    let mut material_keys = Vec::new();
-    let mut num_games = Vec::new();
-    let mut num_pieces = Vec::new();
-    let mut material_key_size = Vec::new();
-    let mut utility = Vec::new();
-    for row in rows {
-        let (material_key, games, pieces, size, score) = row?;
-        material_keys.push(material_key);
-        num_games.push(games);
-        num_pieces.push(pieces);
-        material_key_size.push(size);
-        utility.push(score);
-    }
 
-    Ok(DataFrame::new(vec![
-        Series::new("material_key", material_keys),
-        Series::new("num_games", num_games),
-        Series::new("num_pieces", num_pieces),
-        Series::new("material_key_size", material_key_size),
-        Series::new("utility", utility),
-    ])?)
+    rows.collect::<Result<Vec<_>, _>>().map_err(Into::into)
 }
 
 struct HistogramRow {
@@ -176,3 +128,70 @@ fn format_ratio(numerator: i64, denominator: i64) -> String {
 fn format_float(value: f64) -> String {
     format!("{value:.12e}")
 }
+
+#[cfg(test)]
+mod tests {
+    use super::build_piece_histogram;
+    use heisenbase::storage::{Database, PgnIndexRow};
+    use std::fs;
+    use std::path::PathBuf;
+    use std::time::{SystemTime, UNIX_EPOCH};
+
+    #[test]
+    fn groups_utility_ranked_tables_under_budget_by_piece_count() {
+        let db_path = temp_db_path("piece-histogram");
+        let mut db = Database::open_at(&db_path).unwrap();
+        db.replace_pgn_index(&[
+            pgn_row("KQvK", 3, 100, 0.5),
+            pgn_row("KRvK", 3, 100, 0.25),
+            pgn_row("KQvKR", 4, 1_000, 0.125),
+            pgn_row("KQRvKR", 5, 10_000, 0.0625),
+        ])
+        .unwrap();
+
+        let rows = build_piece_histogram(&db, 1_200, 1, None).unwrap();
+        assert_eq!(rows.len(), 2);
+        assert_eq!(rows[0].num_pieces, 3);
+        assert_eq!(rows[0].tables, 2);
+        assert_eq!(rows[0].positions, 200);
+        assert_eq!(rows[0].pgn_position_fraction, 0.75);
+        assert_eq!(rows[1].num_pieces, 4);
+        assert_eq!(rows[1].tables, 1);
+        assert_eq!(rows[1].positions, 1_000);
+
+        let rows = build_piece_histogram(&db, 1_000_000, 1, Some(3)).unwrap();
+        assert_eq!(rows.len(), 1);
+        assert_eq!(rows[0].tables, 2);
+
+        drop(db);
+        fs::remove_file(&db_path).unwrap();
+    }
+
+    fn pgn_row(
+        material_key: &str,
+        num_pieces: i64,
+        material_key_size: i64,
+        utility: f64,
+    ) -> PgnIndexRow {
+        PgnIndexRow {
+            material_key: material_key.to_string(),
+            num_games: 2,
+            num_positions: 1,
+            total_games: 1,
+            total_positions: 1,
+            material_key_size,
+            num_pieces,
+            num_pawns: 0,
+            num_non_pawns: num_pieces,
+            utility,
+        }
+    }
+
+    fn temp_db_path(label: &str) -> PathBuf {
+        let unique = SystemTime::now()
+            .duration_since(UNIX_EPOCH)
+            .unwrap()
+            .as_nanos();
+        std::env::temp_dir().join(format!("heisenbase-{label}-{unique}.db"))
+    }
+}
@@ -1,7 +1,7 @@
 use anyhow::{Result, bail};
 use clap::Args;
 use heisenbase::storage::Database;
-use polars::prelude::*;
+use rusqlite::params;
 
 #[derive(Args)]
 #[command(
@@ -29,8 +29,13 @@ pub(crate) fn run(args: SizeCurveArgs) -> Result<()> {
     }
 
     let db = Database::open_default()?;
-    let frame = build_size_curve(&db, args.min_games, args.max_pieces)?;
-    let points = sample_curve(&frame, args.points, args.max_positions)?;
+    let points = build_size_curve(
+        &db,
+        args.min_games,
+        args.max_pieces,
+        args.max_positions,
+        args.points,
+    )?;
 
     println!("rank_by: utility_rank");
     println!("points: {}", args.points);
@@ -65,100 +70,94 @@ pub(crate) fn run(args: SizeCurveArgs) -> Result<()> {
     Ok(())
 }
 
-fn build_size_curve(db: &Database, min_games: u64, max_pieces: Option<u32>) -> Result<DataFrame> {
-    let mut ranked = load_pgn_index_df(db)?.lazy().filter(
-        col("num_games")
-            .cast(DataType::Int64)
-            .gt_eq(lit(min_games as i64)),
-    );
-    if let Some(max_pieces) = max_pieces {
-        ranked = ranked.filter(
-            col("num_pieces")
-                .cast(DataType::Int64)
-                .lt_eq(lit(max_pieces as i64)),
-        );
-    }
+fn build_size_curve(
+    db: &Database,
+    min_games: u64,
+    max_pieces: Option<u32>,
+    max_positions: Option<u64>,
+    point_count: usize,
+) -> Result<Vec<CurvePoint>> {
+    let max_positions = max_positions.map(i64::try_from).transpose()?;
+    // The ranking order matches the pgn_index_utility_rank index, so rows stream
+    // out without a sort and reading stops once the last budget is placed.
+    let mut stmt = db.conn().prepare(
+        "SELECT
+            material_key,
+            SUM(material_key_size) OVER ranked AS cumulative_positions,
+            SUM(utility) OVER ranked AS cumulative_pgn_position_fraction,
+            (
+                SELECT SUM(material_key_size)
+                FROM pgn_index
+                WHERE num_games >= ?1
+                  AND (?2 IS NULL OR num_pieces <= ?2)
+            ) AS total_positions
+         FROM pgn_index_ranked
+         WHERE num_games >= ?1
+           AND (?2 IS NULL OR num_pieces <= ?2)
+         WINDOW ranked AS (
+            ORDER BY utility_rank DESC, utility DESC, material_key ASC
+            ROWS UNBOUNDED PRECEDING
+         )
+         ORDER BY utility_rank DESC, utility DESC, material_key ASC",
+    )?;
+    let tables = stmt.query_map(
+        params![min_games as i64, max_pieces.map(i64::from)],
+        |row| {
+            Ok(RankedTable {
+                material_key: row.get(0)?,
+                cumulative_positions: row.get(1)?,
+                cumulative_pgn_fraction: row.get(2)?,
+                total_positions: row.get(3)?,
+            })
+        },
+    )?;
 
-    Ok(ranked
-        .with_columns([
-            (col("utility") / col("material_key_size").cast(DataType::Float64))
-                .alias("utility_rank"),
-        ])
-        .sort(
-            ["utility_rank", "utility", "material_key"],
-            SortMultipleOptions::new().with_order_descending_multi([true, true, false]),
-        )
-        .with_columns([
-            col("material_key_size")
-                .cum_sum(false)
-                .alias("cumulative_positions"),
-            col("utility")
-                .cum_sum(false)
-                .alias("cumulative_pgn_position_fraction"),
-        ])
-        .select([
-            col("material_key"),
-            col("cumulative_positions"),
-            col("cumulative_pgn_position_fraction"),
-        ])
-        .collect()?)
+    sample_curve(tables, point_count, max_positions)
 }
 
 fn sample_curve(
-    frame: &DataFrame,
+    mut tables: impl Iterator<Item = rusqlite::Result<RankedTable>>,
     point_count: usize,
-    max_positions: Option<u64>,
+    max_positions: Option<i64>,
 ) -> Result<Vec<CurvePoint>> {
-    if frame.is_empty() {
+    let Some(first) = tables.next().transpose()? else {
         return Ok(Vec::new());
-    }
+    };
 
-    let cumulative_positions: Vec<i64> = frame
-        .column("cumulative_positions")?
-        .i64()?
-        .into_no_null_iter()
-        .collect();
-    let cumulative_pgn_fraction: Vec<f64> = frame
-        .column("cumulative_pgn_position_fraction")?
-        .f64()?
-        .into_no_null_iter()
-        .collect();
-    let material_keys: Vec<&str> = frame
-        .column("material_key")?
-        .str()?
-        .into_no_null_iter()
-        .collect();
-
-    let available_max = *cumulative_positions.last().unwrap();
-    let requested_max = max_positions
-        .map(i64::try_from)
-        .transpose()?
-        .unwrap_or(available_max);
-    let max_budget = requested_max.min(available_max);
-    let min_budget = cumulative_positions[0];
+    let available_max = first.total_positions;
+    let max_budget = max_positions.unwrap_or(available_max).min(available_max);
+    let min_budget = first.cumulative_positions;
     if max_budget < min_budget {
         return Ok(Vec::new());
     }
 
+    // Tables arrive in rank order with increasing cumulative sizes, so a single
+    // merge walk against the ascending budgets finds every checkpoint. Only the
+    // last table under the current budget is kept alive.
     let mut points = Vec::new();
-    let mut previous_index = None;
+    let mut next_table = Some(first);
+    let mut last_selected = None;
+    let mut selected_tables = 0;
+    let mut previous_selected_tables = 0;
     for budget in logarithmic_budgets(min_budget, max_budget, point_count) {
-        let selected_tables =
-            cumulative_positions.partition_point(|positions| *positions <= budget);
-        if selected_tables == 0 {
-            continue;
+        while let Some(table) = next_table.take_if(|table| table.cumulative_positions <= budget) {
+            selected_tables += 1;
+            last_selected = Some(table);
+            next_table = tables.next().transpose()?;
         }
-        let index = selected_tables - 1;
-        if previous_index == Some(index) {
+        let Some(table) = &last_selected else {
+            continue;
+        };
+        if selected_tables == previous_selected_tables {
             continue;
         }
-        previous_index = Some(index);
+        previous_selected_tables = selected_tables;
         points.push(CurvePoint {
             budget_positions: budget,
             selected_tables,
-            selected_positions: cumulative_positions[index],
-            pgn_position_fraction: cumulative_pgn_fraction[index],
-            last_material_key: material_keys[index].to_string(),
+            selected_positions: table.cumulative_positions,
+            pgn_position_fraction: table.cumulative_pgn_fraction,
+            last_material_key: table.material_key.clone(),
         });
     }
     Ok(points)
@@ -181,42 +180,11 @@ fn logarithmic_budgets(min: i64, max: i64, count: usize) -> Vec<i64> {
     budgets
 }
 
-fn load_pgn_index_df(db: &Database) -> Result<DataFrame> {
-    let mut stmt = db.conn().prepare(
-        "SELECT material_key, num_games, num_pieces, material_key_size, utility
-         FROM pgn_index",
-    )?;
-    let rows = stmt.query_map([], |row| {
-        Ok((
-            row.get::<_, String>(0)?,
-            row.get::<_, i64>(1)?,
-            row.get::<_, i64>(2)?,
-            row.get::<_, i64>(3)?,
-            row.get::<_, f64>(4)?,
-        ))
-    })?;
-
-    let mut material_keys = Vec::new();
-    let mut num_games = Vec::new();
-    let mut num_pieces = Vec::new();
-    let mut material_key_size = Vec::new();
-    let mut utility = Vec::new();
-    for row in rows {
-        let (material_key, games, pieces, size, score) = row?;
-        material_keys.push(material_key);
-        num_games.push(games);
-        num_pieces.push(pieces);
-        material_key_size.push(size);
-        utility.push(score);
-    }
-
-    Ok(DataFrame::new(vec![
-        Series::new("material_key", material_keys),
-        Series::new("num_games", num_games),
-        Series::new("num_pieces", num_pieces),
-        Series::new("material_key_size", material_key_size),
-        Series::new("utility", utility),
-    ])?)
+struct RankedTable {
+    material_key: String,
+    cumulative_positions: i64,
+    cumulative_pgn_fraction: f64,
+    total_positions: i64,
 }
 
 struct CurvePoint {
@@ -233,7 +201,7 @@ fn format_float(value: f64) -> String {
 
 #[cfg(test)]
 mod tests {
-    use super::logarithmic_budgets;
+    use super::{RankedTable, logarithmic_budgets, sample_curve};
 
     #[test]
     fn logarithmic_budgets_include_endpoints() {
@@ -242,4 +210,40 @@ mod tests {
         assert_eq!(budgets.last(), Some(&1_000_000));
         assert!(budgets.windows(2).all(|pair| pair[0] < pair[1]));
     }
+
+    #[test]
+    fn sample_curve_reports_last_table_under_each_budget() {
+        let tables = [
+            ("KQvK", 100, 0.5),
+            ("KRvK", 200, 0.75),
+            ("KQvKR", 1_200, 0.875),
+        ]
+        .into_iter()
+        .map(
+            |(material_key, cumulative_positions, cumulative_pgn_fraction)| {
+                Ok(RankedTable {
+                    material_key: material_key.to_string(),
+                    cumulative_positions,
+                    cumulative_pgn_fraction,
+                    total_positions: 11_200,
+                })
+            },
+        );
+
+        let points = sample_curve(tables, 3, Some(1_200)).unwrap();
+        let summary: Vec<_> = points
+            .iter()
+            .map(|point| {
+                (
+                    point.budget_positions,
+                    point.selected_tables,
+                    point.last_material_key.as_str(),
+                )
+            })
+            .collect();
+        assert_eq!(
+            summary,
+            vec![(100, 1, "KQvK"), (346, 2, "KRvK"), (1_200, 3, "KQvKR")]
+        );
+    }
 }
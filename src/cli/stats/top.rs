@@ -58,8 +58,8 @@ pub(crate) fn run(args: TopArgs) -> Result<()> {
             p.material_key_size,
             p.num_pieces,
             p.utility,
-            p.utility / CAST(p.material_key_size AS REAL) AS utility_rank
-         FROM pgn_index p
+            p.utility_rank
+         FROM pgn_index_ranked p
          WHERE p.num_games >= ?1
            AND (?2 IS NULL OR p.num_pieces <= ?2)
          ORDER BY {order_by}
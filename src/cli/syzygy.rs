@@ -38,10 +38,29 @@ fn heisenbase_allows(wdl: WdlScoreRange, syzygy: SimpleWdl) -> bool {
     }
 }
 
-fn collect_valid_indices(indexer: &PositionIndexer) -> Vec<usize> {
-    (0..indexer.total_positions())
-        .filter(|&idx| indexer.index_to_position(idx).is_ok())
-        .collect()
+/// Reservoir-sample up to `count` valid positions in a single pass over the table.
+fn sample_valid_positions(
+    indexer: &PositionIndexer,
+    count: usize,
+    rng: &mut impl Rng,
+) -> Vec<(usize, Chess)> {
+    let mut samples = Vec::with_capacity(count);
+    let mut seen = 0usize;
+    for idx in 0..indexer.total_positions() {
+        let Ok(pos) = indexer.index_to_position(idx) else {
+            continue;
+        };
+        seen += 1;
+        if samples.len() < count {
+            samples.push((idx, pos));
+        } else {
+            let slot = rng.gen_range(0..seen);
+            if slot < count {
+                samples[slot] = (idx, pos);
+            }
+        }
+    }
+    samples
 }
 
 pub(crate) fn run() -> Result<()> {
@@ -85,8 +104,8 @@ pub(crate) fn run() -> Result<()> {
                 continue;
             };
             let indexer = PositionIndexer::new(material.clone());
-            let valid_indices = collect_valid_indices(&indexer);
-            if valid_indices.is_empty() {
+            let samples = sample_valid_positions(&indexer, SAMPLES_PER_TABLE, &mut rng);
+            if samples.is_empty() {
                 eprintln!("No valid positions for {}", material);
                 continue;
             }
@@ -96,19 +115,13 @@ pub(crate) fn run() -> Result<()> {
             let mut missing_table = false;
             let mut probe_failed = false;
 
-            for _ in 0..SAMPLES_PER_TABLE {
-                let idx = valid_indices[rng.gen_range(0..valid_indices.len())];
-                let pos = match indexer.index_to_position(idx) {
-                    Ok(pos) => pos,
-                    Err(_) => continue,
-                };
-
-                let hb_wdl = table.positions[idx];
+            for (idx, pos) in &samples {
+                let hb_wdl = table.positions[*idx];
                 if hb_wdl.is_uncertain() {
                     uncertain += 1;
                 }
 
-                let syzygy_wdl = match tablebase.probe_wdl_after_zeroing(&pos) {
+                let syzygy_wdl = match tablebase.probe_wdl_after_zeroing(pos) {
                     Ok(wdl) => wdl,
                     Err(SyzygyError::MissingTable { .. }) => {
                         missing_table = true;
@@ -123,7 +136,7 @@ pub(crate) fn run() -> Result<()> {
                 if !heisenbase_allows(hb_wdl, simplify_wdl(syzygy_wdl)) {
                     mismatches += 1;
                     if mismatches <= MAX_MISMATCHES_PER_TABLE {
-                        let fen = Fen::from_position(&pos, EnPassantMode::Legal).to_string();
+                        let fen = Fen::from_position(pos, EnPassantMode::Legal).to_string();
                         println!(
                             "Mismatch {}: hb={:?}, syzygy={:?}, fen={}",
                             material, hb_wdl, syzygy_wdl, fen
@@ -143,7 +156,7 @@ pub(crate) fn run() -> Result<()> {
                 continue;
             }
 
-            total_positions += SAMPLES_PER_TABLE;
+            total_positions += samples.len();
             total_mismatches += mismatches;
             total_uncertain += uncertain;
 
@@ -1,6 +1,6 @@
 use anyhow::{Result, anyhow};
 use polars::prelude::*;
-use rusqlite::Connection;
+use rusqlite::{Connection, params};
 
 use crate::material_key::MaterialKey;
 use crate::position_indexer::PositionIndexer;
@@ -43,13 +43,49 @@ pub struct TransitiveUtilityContribution {
     pub contribution: f64,
 }
 
+/// In-memory copy of the `pgn_index` rows used to rank generation targets.
+///
+/// Generating tables never writes to `pgn_index`, so callers that recompute
+/// targets after every generated table can load it once and reuse it. Tables
+/// solved after loading were candidates, so their rows are already present.
+pub struct PgnIndexSnapshot {
+    frame: DataFrame,
+    min_games: u64,
+    max_pieces: u32,
+}
+
+impl PgnIndexSnapshot {
+    pub fn load(db: &Database, min_games: u64, max_pieces: u32) -> Result<Self> {
+        Ok(Self {
+            frame: load_pgn_index_df(db.conn(), min_games, max_pieces)?,
+            min_games,
+            max_pieces,
+        })
+    }
+}
+
 pub fn compute_generation_targets(
     db: &Database,
     min_games: u64,
     max_pieces: u32,
+    limit: usize,
+) -> Result<Vec<GenerationTarget>> {
+    let pgn_index = PgnIndexSnapshot::load(db, min_games, max_pieces)?;
+    compute_generation_targets_with_index(db, &pgn_index, limit)
+}
+
+pub fn compute_generation_targets_with_index(
+    db: &Database,
+    pgn_index: &PgnIndexSnapshot,
+    limit: usize,
 ) -> Result<Vec<GenerationTarget>> {
+    let PgnIndexSnapshot {
+        frame,
+        min_games,
+        max_pieces,
+    } = pgn_index;
     let material_lf = load_material_keys_df(db.conn())?.lazy();
-    let pgn_lf = load_pgn_index_df(db.conn())?.lazy();
+    let pgn_lf = frame.clone().lazy();
     let transitive_lf = compute_transitive_utility_lf(material_lf.clone(), pgn_lf.clone());
     let stale_lf = compute_stale_material_keys_lf(material_lf.clone());
 
@@ -61,17 +97,19 @@ pub fn compute_generation_targets(
     // - `has_table` means the material key is already solved
     // - `is_stale` means at least one solved child dependency is newer than it
     //
-    // Stale solved tables always rank ahead of unsolved tables.
+    // Stale solved tables always rank ahead of unsolved tables. Up-to-date solved
+    // tables are dropped before sorting so the trailing limit lets polars select
+    // the top `limit` rows instead of sorting every candidate.
     let sorted = pgn_lf
         .filter(
             col("num_games")
                 .cast(DataType::Int64)
-                .gt(lit(min_games as i64)),
+                .gt(lit(*min_games as i64)),
         )
         .filter(
             col("num_pieces")
                 .cast(DataType::Int64)
-                .lt_eq(lit(max_pieces as i64)),
+                .lt_eq(lit(*max_pieces as i64)),
         )
         .join(
             transitive_lf,
@@ -96,6 +134,7 @@ pub fn compute_generation_targets(
             col("updated_at").is_not_null().alias("has_table"),
             col("is_stale").fill_null(lit(false)),
         ])
+        .filter(col("has_table").not().or(col("is_stale")))
         .with_columns([
             (col("utility") / col("material_key_size").cast(DataType::Float64))
                 .alias("utility_rank"),
@@ -112,11 +151,11 @@ pub fn compute_generation_targets(
             ],
             SortMultipleOptions::new().with_order_descending_multi([true, true, true, true, false]),
         )
+        .limit(IdxSize::try_from(limit).unwrap_or(IdxSize::MAX))
         .collect()?;
 
     let keys = sorted.column("material_key")?.str()?;
     let stale = sorted.column("is_stale")?.bool()?;
-    let solved = sorted.column("has_table")?.bool()?;
     let num_games = sorted.column("num_games")?.i64()?;
     let material_key_size = sorted.column("material_key_size")?.i64()?;
     let utility = sorted.column("utility")?.f64()?;
@@ -131,12 +170,6 @@ pub fn compute_generation_targets(
         let is_stale = stale
             .get(index)
             .ok_or_else(|| anyhow!("is_stale is null"))?;
-        let has_table = solved
-            .get(index)
-            .ok_or_else(|| anyhow!("has_table is null"))?;
-        if has_table && !is_stale {
-            continue;
-        }
         let material_key = MaterialKey::from_string(key)
             .map_err(|err| anyhow!("invalid material key in pgn_index: {key}: {err}"))?;
         candidates.push(GenerationTarget {
@@ -176,7 +209,7 @@ pub fn compute_utility_stats(db: &Database, material: &MaterialKey) -> Result<Ut
     let utility = pgn_row.as_ref().map_or(0.0, |row| row.utility);
 
     let material_lf = load_material_keys_df(db.conn())?.lazy();
-    let pgn_lf = load_pgn_index_df(db.conn())?.lazy();
+    let pgn_lf = load_pgn_utility_df(db.conn())?.lazy();
     let contributions_df = compute_transitive_utility_contributions_lf(material_lf, pgn_lf)
         .filter(col("material_key").eq(lit(material.to_string())))
         .filter(col("contribution").gt(lit(0.0)))
@@ -292,12 +325,16 @@ fn load_material_keys_df(conn: &Connection) -> Result<DataFrame> {
     ])?)
 }
 
-fn load_pgn_index_df(conn: &Connection) -> Result<DataFrame> {
+fn load_pgn_index_df(conn: &Connection, min_games: u64, max_pieces: u32) -> Result<DataFrame> {
+    // Only candidate rows and solved parents (whose utility propagates to their
+    // children) are ever read, so the rest of the index stays in SQLite.
     let mut stmt = conn.prepare(
         "SELECT material_key, num_games, num_pieces, material_key_size, utility
-         FROM pgn_index",
+         FROM pgn_index
+         WHERE (num_games > ?1 AND num_pieces <= ?2)
+            OR material_key IN (SELECT name FROM material_keys)",
     )?;
-    let rows = stmt.query_map([], |row| {
+    let rows = stmt.query_map(params![min_games as i64, i64::from(max_pieces)], |row| {
         Ok((
             row.get::<_, String>(0)?,
             row.get::<_, i64>(1)?,
@@ -330,6 +367,31 @@ fn load_pgn_index_df(conn: &Connection) -> Result<DataFrame> {
     ])?)
 }
 
+fn load_pgn_utility_df(conn: &Connection) -> Result<DataFrame> {
+    // Only solved parents contribute transitive utility.
+    let mut stmt = conn.prepare(
+        "SELECT material_key, utility
+         FROM pgn_index
+         WHERE material_key IN (SELECT name FROM material_keys)",
+    )?;
+    let rows = stmt.query_map([], |row| {
+        Ok((row.get::<_, String>(0)?, row.get::<_, f64>(1)?))
+    })?;
+
+    let mut material_keys = Vec::new();
+    let mut utility = Vec::new();
+    for row in rows {
+        let (material_key, score) = row?;
+        material_keys.push(material_key);
+        utility.push(score);
+    }
+
+    Ok(DataFrame::new(vec![
+        Series::new("material_key", material_keys),
+        Series::new("utility", utility),
+    ])?)
+}
+
 fn compute_transitive_utility_lf(material_lf: LazyFrame, pgn_lf: LazyFrame) -> LazyFrame {
     compute_transitive_utility_contributions_lf(material_lf, pgn_lf)
         .group_by([col("material_key")])
@@ -588,7 +650,7 @@ mod tests {
         )
         .unwrap();
 
-        let target = compute_generation_targets(&db, 1, 5)
+        let target = compute_generation_targets(&db, 1, 5, 1)
             .unwrap()
             .into_iter()
             .next()
@@ -599,6 +661,116 @@ mod tests {
         fs::remove_file(&db_path).unwrap();
     }
 
+    #[test]
+    fn solved_parent_outside_candidate_filters_still_propagates_utility() {
+        let db_path = temp_db_path("filtered-parent");
+        let mut db = Database::open_at(&db_path).unwrap();
+        db.upsert_material_stats(&MaterialStatsRow {
+            name: "KQvKR".to_string(),
+            children: vec!["KNvK".to_string()],
+            num_pieces: 5,
+            num_pawns: 0,
+            num_non_pawns: 5,
+            total: 100,
+            illegal: 0,
+            win: 70,
+            draw: 0,
+            loss: 0,
+            win_or_draw: 10,
+            draw_or_loss: 10,
+            unknown: 10,
+            updated_at: 1,
+        })
+        .unwrap();
+        // The parent fails both candidate filters below (num_games > 1 and
+        // num_pieces <= 4), but its utility must still reach its child.
+        db.replace_pgn_index(&[
+            pgn_index_row("KQvKR", 1, 100, 5, 0.2),
+            pgn_index_row("KNvK", 100, 10, 3, 0.9),
+        ])
+        .unwrap();
+
+        let targets = compute_generation_targets(&db, 1, 4, 10).unwrap();
+        assert_eq!(targets.len(), 1);
+        let target = &targets[0];
+        assert_eq!(target.material_key.to_string(), "KNvK");
+        assert!((target.transitive_utility - 0.06).abs() < 1e-12);
+
+        let material = MaterialKey::from_string("KNvK").unwrap();
+        let stats = compute_utility_stats(&db, &material).unwrap();
+        assert!((target.transitive_utility - stats.transitive_utility).abs() < 1e-12);
+        assert!((target.transitive_utility_rank - stats.transitive_utility_rank).abs() < 1e-12);
+
+        drop(db);
+        fs::remove_file(&db_path).unwrap();
+    }
+
+    #[test]
+    fn skips_up_to_date_tables_and_applies_limit() {
+        let db_path = temp_db_path("limit");
+        let mut db = Database::open_at(&db_path).unwrap();
+        db.upsert_material_stats(&MaterialStatsRow {
+            name: "KQvK".to_string(),
+            children: Vec::new(),
+            num_pieces: 3,
+            num_pawns: 0,
+            num_non_pawns: 3,
+            total: 100,
+            illegal: 0,
+            win: 100,
+            draw: 0,
+            loss: 0,
+            win_or_draw: 0,
+            draw_or_loss: 0,
+            unknown: 0,
+            updated_at: 1,
+        })
+        .unwrap();
+        // KQvK has the highest utility but is already solved and up to date.
+        db.replace_pgn_index(&[
+            pgn_index_row("KQvK", 10, 1, 3, 0.9),
+            pgn_index_row("KRvK", 10, 1, 3, 0.5),
+            pgn_index_row("KNvK", 10, 1, 3, 0.25),
+        ])
+        .unwrap();
+
+        let targets = compute_generation_targets(&db, 1, 5, 10).unwrap();
+        let keys: Vec<String> = targets
+            .iter()
+            .map(|target| target.material_key.to_string())
+            .collect();
+        assert_eq!(keys, ["KRvK", "KNvK"]);
+
+        let targets = compute_generation_targets(&db, 1, 5, 1).unwrap();
+        assert_eq!(targets.len(), 1);
+        assert_eq!(targets[0].material_key.to_string(), "KRvK");
+        assert!(!targets[0].is_stale);
+
+        drop(db);
+        fs::remove_file(&db_path).unwrap();
+    }
+
+    fn pgn_index_row(
+        material_key: &str,
+        num_games: i64,
+        material_key_size: i64,
+        num_pieces: i64,
+        utility: f64,
+    ) -> PgnIndexRow {
+        PgnIndexRow {
+            material_key: material_key.to_string(),
+            num_games,
+            num_positions: num_games,
+            total_games: 100,
+            total_positions: 100,
+            material_key_size,
+            num_pieces,
+            num_pawns: 0,
+            num_non_pawns: num_pieces,
+            utility,
+        }
+    }
+
     fn seed_wdl_table(conn: &Connection, material_key: &str) {
         conn.execute(
             "INSERT INTO wdl_tables (material_key, payload) VALUES (?1, X'00')",
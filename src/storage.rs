@@ -369,6 +369,7 @@ fn init_db(conn: &Connection) -> Result<()> {
             unknown INTEGER NOT NULL,
             updated_at INTEGER NOT NULL DEFAULT 0
         );
+        CREATE INDEX IF NOT EXISTS material_keys_num_pieces ON material_keys (num_pieces);
         CREATE TABLE IF NOT EXISTS pgn_index_raw (
             material_key TEXT PRIMARY KEY,
             num_games INTEGER NOT NULL,
@@ -387,7 +388,26 @@ fn init_db(conn: &Connection) -> Result<()> {
             num_pawns INTEGER NOT NULL,
             num_non_pawns INTEGER NOT NULL,
             utility REAL NOT NULL
-        );",
+        );
+        CREATE INDEX IF NOT EXISTS pgn_index_utility_rank ON pgn_index (
+            utility / CAST(material_key_size AS REAL) DESC,
+            utility DESC,
+            material_key ASC
+        );
+        CREATE VIEW IF NOT EXISTS pgn_index_ranked AS
+        SELECT
+            material_key,
+            num_games,
+            num_positions,
+            total_games,
+            total_positions,
+            material_key_size,
+            num_pieces,
+            num_pawns,
+            num_non_pawns,
+            utility,
+            utility / CAST(material_key_size AS REAL) AS utility_rank
+        FROM pgn_index;",
     )?;
     Ok(())
 }